@@ -1,11 +1,74 @@
 import logging
+import os
+import threading
 import time
+import math
+import fractions
+import collections
+import concurrent.futures
 import numpy as np
+try:
+    import numba
+    numba_available = True
+except ImportError:
+    numba_available = False
 from NuRadioReco.utilities import units
-from scipy.interpolate import interp1d
-from scipy.signal import resample
+import scipy.fft
+from scipy.signal import resample_poly
+from scipy.ndimage import convolve1d
 from NuRadioReco.modules.base.module import register_run
-from NuRadioReco.utilities.trace_utilities import delay_trace
+
+
+if numba_available:
+    # numba's default threading layer aborts if parallel kernels are launched
+    # from several threads at once, so the calls are serialised process-wide
+    _digitise_counts_lock = threading.Lock()
+
+    @numba.njit(parallel=True, cache=True)
+    def _digitise_counts(trace, scale, lowest_count, highest_count, ceiling, digital_trace):
+        """
+        Single pass scaling, rounding and clipping of a flat trace into a
+        preallocated integer array. Used by perfect_comparator if numba is
+        installed.
+        """
+        for i in numba.prange(trace.shape[0]):
+            if ceiling:
+                count = np.ceil(trace[i] * scale)
+            else:
+                count = np.floor(trace[i] * scale)
+            if count > highest_count:
+                count = highest_count
+            elif count < lowest_count:
+                count = lowest_count
+            digital_trace[i] = count
+
+
+ADCParameters = collections.namedtuple('ADCParameters', ['n_bits', 'noise_n_bits', 'ref_voltage',
+                                                         'sampling_frequency', 'time_delay'])
+
+
+def adc_counts_dtype(adc_n_bits):
+    """
+    Returns the smallest signed integer type that can hold the counts of an
+    ADC with adc_n_bits bits.
+
+    Parameters
+    ----------
+    adc_n_bits: int
+        Number of bits of the ADC
+
+    Returns
+    -------
+    dtype: numpy integer type
+        np.int8, np.int16 or np.int32
+    """
+
+    if (adc_n_bits <= 8):
+        return np.int8
+    elif (adc_n_bits <= 16):
+        return np.int16
+    else:
+        return np.int32
 
 
 def perfect_comparator(trace, adc_n_bits, adc_ref_voltage, mode='floor', output='voltage'):
@@ -28,31 +91,51 @@ def perfect_comparator(trace, adc_n_bits, adc_ref_voltage, mode='floor', output=
     output: string
         - 'voltage' to store the ADC output as discretised voltage trace
         - 'counts' to store the ADC output in ADC counts
+        - 'packed' to store the ADC counts bit-packed along the last axis,
+          adc_n_bits bits per sample (see pack_counts)
 
     Returns
     -------
-    digital_trace: array of floats
-        Digitised voltage trace in volts or ADC counts
+    digital_trace: array of floats or ints
+        Digitised voltage trace in volts (float32), ADC counts (smallest
+        integer type holding adc_n_bits, see adc_counts_dtype) or packed
+        ADC counts (uint8)
     """
 
-    lsb_voltage = adc_ref_voltage / (2 ** (adc_n_bits - 1) - 1)
+    highest_count = 2 ** (adc_n_bits - 1) - 1
+    lowest_count = -2 ** (adc_n_bits - 1)
+    lsb_voltage = adc_ref_voltage / highest_count
+
+    if mode not in ['floor', 'ceiling']:
+        raise ValueError('Choose floor or ceiing as modes for the comparator ADC')
 
-    if (mode == 'floor'):
-        digital_trace = np.floor(trace / lsb_voltage)
-    elif (mode == 'ceiling'):
-        digital_trace = np.ceil(trace / lsb_voltage)
+    if numba_available:
+        trace = np.ascontiguousarray(trace)
+        digital_trace = np.empty(trace.shape, dtype=adc_counts_dtype(adc_n_bits))
+        # The scale has the precision that numpy would use for the product, so
+        # that the counts do not depend on whether numba is installed
+        scale = np.result_type(trace, 1.).type(highest_count / adc_ref_voltage)
+        with _digitise_counts_lock:
+            _digitise_counts(trace.ravel(), scale, lowest_count, highest_count,
+                             mode == 'ceiling', digital_trace.ravel())
     else:
-        raise ValueError('Choose floor or ceiing as modes for the comparator ADC')
+        # A single temporary is used for the scaling, rounding and clipping
+        digital_trace = np.multiply(trace, highest_count / adc_ref_voltage)
+        if (mode == 'floor'):
+            np.floor(digital_trace, out=digital_trace)
+        else:
+            np.ceil(digital_trace, out=digital_trace)
 
-    digital_trace = apply_saturation(digital_trace, adc_n_bits, adc_ref_voltage)
-    digital_trace = round_to_int(digital_trace)
+        digital_trace = apply_saturation(digital_trace, adc_n_bits, adc_ref_voltage, in_place=True)
 
     if (output == 'voltage'):
-        digital_trace = lsb_voltage * digital_trace.astype(np.float)
+        digital_trace = np.multiply(digital_trace, lsb_voltage, dtype=np.float32)
     elif (output == 'counts'):
         pass
+    elif (output == 'packed'):
+        digital_trace = pack_counts(digital_trace, adc_n_bits)
     else:
-        raise ValueError("The ADC output format is unknown. Please choose 'voltage' or 'counts'")
+        raise ValueError("The ADC output format is unknown. Please choose 'voltage', 'counts' or 'packed'")
 
     return digital_trace  # , lsb_voltage
 
@@ -75,7 +158,7 @@ def perfect_ceiling_comparator(trace, adc_n_bits, adc_ref_voltage, output='volta
     return perfect_comparator(trace, adc_n_bits, adc_ref_voltage, mode='ceiling', output=output)
 
 
-def apply_saturation(adc_counts_trace, adc_n_bits, adc_ref_voltage):
+def apply_saturation(adc_counts_trace, adc_n_bits, adc_ref_voltage, in_place=False):
     """
     Takes a digitised trace in ADC counts and clips the parts of the
     trace with values higher than 2**(adc_n_bits-1)-1 or lower than
@@ -90,34 +173,138 @@ def apply_saturation(adc_counts_trace, adc_n_bits, adc_ref_voltage):
     adc_ref_voltage: float
         Voltage corresponding to the maximum number of counts given by the
         ADC: 2**(adc_n_bits-1) - 1
+    in_place: bool
+        If True, the input trace is clipped in place, which avoids allocating
+        a temporary array. Otherwise the input trace is not modified.
 
     Returns
     -------
-    saturated_trace: array of floats
-        The clipped or saturated voltage trace
+    saturated_trace: array of ints
+        The clipped or saturated trace in ADC counts, stored with the smallest
+        integer type holding adc_n_bits (see adc_counts_dtype)
     """
 
-    saturated_trace = adc_counts_trace[:]
-
     highest_count = 2 ** (adc_n_bits - 1) - 1
-    high_saturation_mask = adc_counts_trace > highest_count
-    saturated_trace[high_saturation_mask] = highest_count
-
     lowest_count = -2 ** (adc_n_bits - 1)
-    low_saturation_mask = adc_counts_trace < lowest_count
-    saturated_trace[low_saturation_mask] = lowest_count
 
-    return saturated_trace
+    if in_place:
+        saturated_trace = np.clip(adc_counts_trace, lowest_count, highest_count, out=adc_counts_trace)
+    else:
+        saturated_trace = np.clip(adc_counts_trace, lowest_count, highest_count)
 
+    return saturated_trace.astype(adc_counts_dtype(adc_n_bits), copy=False)
 
-def round_to_int(digital_trace):
+
+def round_to_int(digital_trace, adc_n_bits=None):
+    """
+    Rounds a trace to the nearest integers. Integer traces are only cast,
+    since there is nothing to round.
+
+    Parameters
+    ----------
+    digital_trace: array of floats or ints
+        Trace to be rounded
+    adc_n_bits: int or None
+        Number of bits of the ADC. If given, the trace is stored with the
+        smallest integer type holding adc_n_bits (see adc_counts_dtype).
+        If None, the default integer type is used
+
+    Returns
+    -------
+    int_trace: array of ints
+        The rounded trace
+    """
+
+    if (adc_n_bits is None):
+        int_dtype = int
+    else:
+        int_dtype = adc_counts_dtype(adc_n_bits)
+
+    digital_trace = np.asarray(digital_trace)
+    if np.issubdtype(digital_trace.dtype, np.integer):
+        return digital_trace.astype(int_dtype, copy=False)
 
     int_trace = np.rint(digital_trace)
-    int_trace = int_trace.astype(int)
+    int_trace = int_trace.astype(int_dtype, copy=False)
 
     return int_trace
 
 
+def pack_counts(adc_counts_trace, adc_n_bits):
+    """
+    Packs ADC counts into a compact byte array, using only adc_n_bits bits
+    per sample. The counts are offset by 2**(adc_n_bits-1) to make them
+    unsigned and their bits are concatenated along the last axis, most
+    significant bit first. For instance, a 4-bit ADC stores two samples
+    per byte. Meant for writing the digitised traces to storage, the
+    traces are not packed during the simulation.
+
+    Parameters
+    ----------
+    adc_counts_trace: array of ints
+        Trace (or traces along the last axis) in ADC counts, between
+        -2**(adc_n_bits-1) and 2**(adc_n_bits-1)-1. A ValueError is raised
+        for counts outside this range
+    adc_n_bits: int
+        Number of bits of the ADC
+
+    Returns
+    -------
+    packed_trace: array of uint8
+        Packed counts, with ceil(n_samples * adc_n_bits / 8) bytes along the
+        last axis. The number of samples is needed to unpack them, see
+        unpack_counts
+    """
+
+    adc_counts_trace = np.asarray(adc_counts_trace)
+    highest_count = 2 ** (adc_n_bits - 1) - 1
+    lowest_count = -2 ** (adc_n_bits - 1)
+    if(adc_counts_trace.size and (adc_counts_trace.min() < lowest_count or adc_counts_trace.max() > highest_count)):
+        error_msg = "The ADC counts do not fit in {} bits. ".format(adc_n_bits)
+        error_msg += "They must be between {} and {}".format(lowest_count, highest_count)
+        raise ValueError(error_msg)
+
+    # Big-endian unsigned integers, so that the bits of every sample are
+    # ordered from the most to the least significant one
+    n_bytes = np.dtype(adc_counts_dtype(adc_n_bits)).itemsize
+    unsigned_counts = (adc_counts_trace.astype(np.int64) - lowest_count).astype('>u{}'.format(n_bytes))
+    bits = np.unpackbits(unsigned_counts.view(np.uint8), axis=-1)
+    bits = bits.reshape(adc_counts_trace.shape + (8 * n_bytes,))[..., -adc_n_bits:]
+    bits = bits.reshape(adc_counts_trace.shape[:-1] + (-1,))
+
+    return np.packbits(bits, axis=-1)
+
+
+def unpack_counts(packed_trace, adc_n_bits, n_samples):
+    """
+    Unpacks ADC counts packed with pack_counts.
+
+    Parameters
+    ----------
+    packed_trace: array of uint8
+        Packed counts along the last axis
+    adc_n_bits: int
+        Number of bits of the ADC
+    n_samples: int
+        Number of samples of the packed trace
+
+    Returns
+    -------
+    adc_counts_trace: array of ints
+        Trace in ADC counts, stored with the smallest integer type holding
+        adc_n_bits (see adc_counts_dtype)
+    """
+
+    packed_trace = np.asarray(packed_trace, dtype=np.uint8)
+    lowest_count = -2 ** (adc_n_bits - 1)
+    bits = np.unpackbits(packed_trace, axis=-1, count=n_samples * adc_n_bits)
+    bits = bits.reshape(packed_trace.shape[:-1] + (n_samples, adc_n_bits))
+    bit_values = 2 ** np.arange(adc_n_bits - 1, -1, -1, dtype=np.int64)
+    adc_counts_trace = bits @ bit_values + lowest_count
+
+    return adc_counts_trace.astype(adc_counts_dtype(adc_n_bits))
+
+
 class analogToDigitalConverter:
     """
     This class simulates an analog to digital converter. The steps followed
@@ -173,8 +360,65 @@ class analogToDigitalConverter:
                                   'adc_noise_nbits',
                                   'adc_sampling_frequency']
 
+        self._upsampling_filters = {}
+        self._adc_parameters_cache = {}
+        # number of fractional delays per sample available for the clock delay
+        self._n_delay_phases = 64
+
+        self._random_generator = np.random.default_rng()
+
         self.logger = logging.getLogger('NuRadioReco.analogToDigitalConverter')
 
+    def begin(self, seed=None):
+        """
+        Parameters
+        ----------
+        seed: int or None
+            Seed of the random generator used for the random clock offsets
+        """
+        self._random_generator = np.random.default_rng(seed)
+
+    def _get_upsampling_filter(self, up, down, delay_phase=0):
+        """
+        Returns the low-pass FIR coefficients used by the polyphase upsampling
+        by a factor up / down, delayed by delay_phase / _n_delay_phases of an
+        input sample. Without delay, the filter is the Kaiser windowed sinc that
+        scipy.signal.resample_poly designs with window=('kaiser', 8.6), not
+        with its default window ('kaiser', 5.0). The filters are only computed
+        once per resampling factor and delay, and reused for every channel and
+        event. The coefficients are stored in single
+        precision, like the traces.
+        """
+        if((up, down, delay_phase) not in self._upsampling_filters):
+            max_rate = max(up, down)
+            half_length = 10 * max_rate
+            beta = 8.6
+            # tap positions with respect to the centre of the filter, in samples of the trace upsampled by up
+            positions = np.arange(2 * half_length + 1) - half_length - delay_phase * up / self._n_delay_phases
+            window = np.i0(beta * np.sqrt(np.clip(1 - (positions / half_length) ** 2, 0, None))) / np.i0(beta)
+            window[np.abs(positions) > half_length] = 0
+            fir_coefficients = np.sinc(positions / max_rate) * window
+            fir_coefficients /= np.sum(fir_coefficients)
+            self._upsampling_filters[(up, down, delay_phase)] = fir_coefficients.astype(np.float32)
+        return self._upsampling_filters[(up, down, delay_phase)]
+
+    def _upsample_and_delay(self, traces, up, down, fractional_delay):
+        """
+        Upsamples the traces along the last axis by a factor up / down and
+        delays them by fractional_delay (in input samples, between -1 and 1,
+        negative values advance the traces) with a single polyphase FIR
+        filter. The delay is rounded to 1 / _n_delay_phases of a sample.
+        """
+        delay_phase = int(round(fractional_delay * self._n_delay_phases))
+        if(up == down):
+            # delays by whole samples do not need any filtering
+            if(delay_phase == 0):
+                return traces
+            elif(delay_phase == -self._n_delay_phases):
+                return traces[..., 1:]
+            return convolve1d(traces, self._get_upsampling_filter(up, down, delay_phase), axis=-1, mode='constant')
+        return resample_poly(traces, up, down, axis=-1, window=self._get_upsampling_filter(up, down, delay_phase))
+
     def get_digital_trace(self, station, det, channel,
                           Vrms=None,
                           trigger_adc=False,
@@ -198,8 +442,10 @@ class analogToDigitalConverter:
         trigger_adc: bool
             If True, the relevant ADC parameters in the config file are the ones
             that start with 'trigger_'
-        random_clock_offset: bool
-            If True, a random clock offset between -1 and 1 clock cycles is added
+        clock_offset: float
+            Offset of the ADC clock, in clock cycles. For random clock offsets
+            drawn from a seeded generator, see random_clock_offset in run and
+            the seed in begin
         adc_type: string
             The type of ADC used. The following are available:
             - perfect_floor_comparator
@@ -210,6 +456,7 @@ class analogToDigitalConverter:
         adc_output: string
             - 'voltage' to store the ADC output as discretised voltage trace
             - 'counts' to store the ADC output in ADC counts
+            'packed' raises a ValueError. Use 'counts' and pack_counts to pack the counts for storage
         trigger_filter: array floats
             Freq. domain of the response to be applied to post-ADC traces
             Must be length for "MC freq"
@@ -222,9 +469,53 @@ class analogToDigitalConverter:
             ADC sampling frequency for the channel
         """
 
-        station_id = station.get_id()
-        channel_id = channel.get_id()
-        det_channel = det.get_channel(station_id, channel_id)
+        trace = channel.get_trace()
+
+        adc_n_bits, adc_ref_voltage, adc_sampling_frequency, adc_time_delay = \
+            self._get_adc_parameters(station, det, channel, Vrms=Vrms, trigger_adc=trigger_adc,
+                                     clock_offset=clock_offset)
+
+        digital_trace = self._get_digital_traces(trace, channel.get_sampling_rate(),
+                                                 adc_n_bits, adc_ref_voltage,
+                                                 adc_sampling_frequency, adc_time_delay,
+                                                 adc_type=adc_type,
+                                                 adc_output=adc_output,
+                                                 trigger_filter=trigger_filter)
+
+        if return_sampling_frequency:
+            return digital_trace, adc_sampling_frequency
+        else:
+            return digital_trace
+
+    def _resolve_adc_parameters(self, det_channel, station_id, channel_id, trigger_adc=False):
+        """
+        Parses the ADC parameters of a channel from its detector description.
+        The result is cached per channel, together with the detector channel
+        dictionary it was parsed from, so the fields are only parsed again if
+        the detector is updated.
+
+        Parameters
+        ----------
+        det_channel: dict
+            Channel description returned by the detector
+        station_id: int
+            Station id
+        channel_id: int
+            Channel id
+        trigger_adc: bool
+            If True, the fields starting with 'trigger_' are read
+
+        Returns
+        -------
+        adc_parameters: ADCParameters
+            The reference voltage is None if it is not in the detector description
+        """
+
+        cache_key = (station_id, channel_id, trigger_adc)
+        if(cache_key in self._adc_parameters_cache):
+            cached_det_channel, adc_parameters = self._adc_parameters_cache[cache_key]
+            if(cached_det_channel is det_channel):
+                return adc_parameters
 
         for field in self._mandatory_fields:
             if(trigger_adc):
@@ -232,15 +523,10 @@ class analogToDigitalConverter:
             else:
                 field_check = field
             if(field_check) not in det_channel:
-                channel_id = channel.get_id()
                 error_msg = "The field {} is not present in channel {}. ".format(field_check, channel_id)
                 error_msg += "Please specify it on your detector file"
                 raise ValueError(error_msg)
 
-        times = channel.get_times()[:]
-        trace = channel.get_trace()[:]
-        MC_sampling_frequency = channel.get_sampling_rate()
-
         if(trigger_adc):  # assumes that the trigger uses
             adc_time_delay_label = "trigger_adc_time_delay"
             adc_n_bits_label = "trigger_adc_nbits"
@@ -250,7 +536,6 @@ class analogToDigitalConverter:
         else:
             adc_time_delay_label = "adc_time_delay"
             adc_n_bits_label = "adc_nbits"
-            adc_noise_n_bits = "adc_noise_nbits"
             adc_noise_n_bits_label = "adc_noise_nbits"
             adc_ref_voltage_label = "adc_reference_voltage"
             adc_sampling_frequency_label = "adc_sampling_frequency"
@@ -260,41 +545,119 @@ class analogToDigitalConverter:
             if(det_channel[adc_time_delay_label] is not None):
                 adc_time_delay = det_channel[adc_time_delay_label] * units.ns
 
-        adc_n_bits = det_channel[adc_n_bits_label]
-        adc_noise_n_bits = det_channel[adc_noise_n_bits_label]
-        adc_sampling_frequency = det_channel[adc_sampling_frequency_label] * units.GHz
-        adc_time_delay += clock_offset / adc_sampling_frequency
+        adc_ref_voltage = None
+        if(adc_ref_voltage_label in det_channel):
+            adc_ref_voltage = det_channel[adc_ref_voltage_label] * units.V
+
+        adc_parameters = ADCParameters(n_bits=det_channel[adc_n_bits_label],
+                                       noise_n_bits=det_channel[adc_noise_n_bits_label],
+                                       ref_voltage=adc_ref_voltage,
+                                       sampling_frequency=det_channel[adc_sampling_frequency_label] * units.GHz,
+                                       time_delay=adc_time_delay)
+
+        # replaces the parameters of a previous detector description of the channel
+        self._adc_parameters_cache[cache_key] = (det_channel, adc_parameters)
+
+        return adc_parameters
+
+    def _get_adc_parameters(self, station, det, channel, Vrms=None, trigger_adc=False, clock_offset=0.0):
+        """
+        Returns the ADC parameters of a channel for one conversion, taking into
+        account Vrms and the clock offset. See get_digital_trace for the
+        parameters.
+
+        Returns
+        -------
+        adc_n_bits: int
+            Number of bits of the ADC
+        adc_ref_voltage: float
+            Reference voltage of the ADC
+        adc_sampling_frequency: float
+            ADC sampling frequency for the channel
+        adc_time_delay: float
+            Time delay of the ADC clock, including the clock offset
+        """
+
+        station_id = station.get_id()
+        channel_id = channel.get_id()
+        adc_parameters = self._resolve_adc_parameters(det.get_channel(station_id, channel_id),
+                                                      station_id, channel_id, trigger_adc)
+
+        adc_sampling_frequency = adc_parameters.sampling_frequency
+        adc_time_delay = adc_parameters.time_delay + clock_offset / adc_sampling_frequency
 
         if(Vrms is None):
-            if(adc_ref_voltage_label not in det_channel):
+            if(adc_parameters.ref_voltage is None):
+                if(trigger_adc):
+                    adc_ref_voltage_label = "trigger_adc_reference_voltage"
+                else:
+                    adc_ref_voltage_label = "adc_reference_voltage"
                 error_msg = "The field {} is not present in channel {}. ".format(adc_ref_voltage_label, channel_id)
                 error_msg += "Please specify it on your detector file"
                 raise ValueError(error_msg)
 
-            adc_ref_voltage = det_channel[adc_ref_voltage_label] * units.V
+            adc_ref_voltage = adc_parameters.ref_voltage
         else:
-            adc_ref_voltage = Vrms * (2 ** (adc_n_bits - 1) - 1) / (2 ** (adc_noise_n_bits - 1) - 1)
+            adc_ref_voltage = Vrms * (2 ** (adc_parameters.n_bits - 1) - 1) / (2 ** (adc_parameters.noise_n_bits - 1) - 1)
 
         if(adc_sampling_frequency > channel.get_sampling_rate()):
             error_msg = 'The ADC sampling rate is greater than '
-            error_msg += 'the channel {} sampling rate. '.format(channel.get_id())
+            error_msg += 'the channel {} sampling rate. '.format(channel_id)
             error_msg += 'Please change the ADC sampling rate.'
             raise ValueError(error_msg)
 
-        if trigger_filter is not None:
+        return adc_parameters.n_bits, adc_ref_voltage, adc_sampling_frequency, adc_time_delay
 
-            trace_fft = np.fft.rfft(trace)
-            if(len(trace_fft) != trigger_filter):
-                raise ValueError("Wrong filter length to apply to traces")
+    def _get_digital_traces(self, traces, MC_sampling_frequency,
+                            adc_n_bits, adc_ref_voltage,
+                            adc_sampling_frequency, adc_time_delay,
+                            adc_type='perfect_floor_comparator',
+                            adc_output='voltage',
+                            trigger_filter=None):
+        """
+        Digitises one trace, or several traces sharing the same sampling rate,
+        length and ADC parameters stacked along the first axis. All operations
+        act on the last axis, so that a whole station can be converted at once.
 
-            trace = np.fft.irfft(trace_fft * trigger_filter)
+        Returns
+        -------
+        digital_traces: array of floats or ints
+            Digitised traces, with the same leading shape as the input traces
+        """
 
-        # Random clock offset
-        delayed_samples = len(trace) - np.int(np.round(MC_sampling_frequency / adc_sampling_frequency)) - 1
-        trace = delay_trace(trace, MC_sampling_frequency, adc_time_delay, delayed_samples)
+        if (adc_output == 'packed'):
+            raise ValueError("Channel traces cannot hold packed ADC counts. Use adc_output='counts' "
+                             "and pack_counts when writing the traces to storage")
 
-        times = times + 1.0 / adc_sampling_frequency
-        times = times[:len(trace)]
+        # The ADC reference voltages and number of bits leave enough dynamic
+        # range to process the traces in single precision
+        traces = np.asarray(traces, dtype=np.float32)
+
+        if trigger_filter is not None:
+
+            traces_fft = scipy.fft.rfft(traces, axis=-1, workers=-1)
+            if(traces_fft.shape[-1] != len(trigger_filter)):
+                raise ValueError("Wrong filter length to apply to traces")
+
+            traces = scipy.fft.irfft(traces_fft * trigger_filter, axis=-1, workers=-1).astype(np.float32)
+
+        # Clock delay and random clock offset. The samples delayed beyond the
+        # start of the trace are discarded, so that the delayed trace starts
+        # at the second sample of the trace, and only the delay modulo one
+        # sample changes the sampled values. The trace is therefore advanced
+        # by one sample minus the fractional delay, which is done by the
+        # upsampling filter below.
+        if(adc_time_delay < 0):
+            raise ValueError('Time delay must be positive')
+        delay_in_samples = adc_time_delay * MC_sampling_frequency
+        whole_delay_in_samples = math.floor(delay_in_samples)
+        fractional_delay = delay_in_samples - whole_delay_in_samples
+        n_discarded_samples = whole_delay_in_samples + 1
+        delayed_samples = traces.shape[-1] - round(MC_sampling_frequency / adc_sampling_frequency) - 1
+        delayed_samples = min(delayed_samples, traces.shape[-1] - n_discarded_samples)
+
+        # The delayed trace starts one ADC clock cycle after the ADC sampling times
+        start_time = 1.0 / adc_sampling_frequency
 
         # Upsampling to 5 GHz before downsampling using interpolation.
         # We cannot downsample with a Fourier method because we want to keep
@@ -302,44 +665,43 @@ class analogToDigitalConverter:
         upsampling_frequency = 5.0 * units.GHz
 
         if(upsampling_frequency > MC_sampling_frequency):
-            upsampling_nsamples = int(upsampling_frequency * len(trace) / MC_sampling_frequency)
-            perfectly_upsampled_trace = resample(trace, upsampling_nsamples)
-
-            perfectly_upsampled_times = np.arange(len(perfectly_upsampled_trace)) / upsampling_frequency
-            perfectly_upsampled_times += times[0]
+            upsampling_factor = fractions.Fraction(upsampling_frequency / MC_sampling_frequency).limit_denominator(100)
+            up, down = upsampling_factor.numerator, upsampling_factor.denominator
         else:
-            perfectly_upsampled_trace = trace[:]
-            perfectly_upsampled_times = times[:]
-
-        interpolate_delayed_trace = interp1d(perfectly_upsampled_times, perfectly_upsampled_trace,
-                                             kind='linear',
-                                             fill_value=(perfectly_upsampled_trace[0], perfectly_upsampled_trace[-1]),
-                                             bounds_error=False)
-
-        # Downsampling to ADC frequency
-        new_n_samples = int((adc_sampling_frequency / MC_sampling_frequency) * len(trace))
-        resampled_times = np.arange(new_n_samples) / adc_sampling_frequency
-        resampled_times += channel.get_trace_start_time()
-        resampled_trace = interpolate_delayed_trace(resampled_times)
+            up, down = 1, 1
+        perfectly_upsampled_traces = self._upsample_and_delay(traces, up, down, fractional_delay - 1)
+        upsampling_frequency = MC_sampling_frequency * up / down
+
+        # Downsampling to ADC frequency. The ADC sampling times are equally
+        # spaced, so the linear interpolation reduces to a two-tap filter
+        # between neighbouring upsampled samples. Times outside the upsampled
+        # trace take the value of the first or last sample.
+        n_upsampled_samples = perfectly_upsampled_traces.shape[-1]
+        new_n_samples = int((adc_sampling_frequency / MC_sampling_frequency) * delayed_samples)
+        sample_positions = (np.arange(new_n_samples) / adc_sampling_frequency - start_time) * upsampling_frequency
+        sample_positions = np.clip(sample_positions, 0, n_upsampled_samples - 1)
+        indices = np.minimum(sample_positions.astype(np.intp), n_upsampled_samples - 2)
+        weights = (sample_positions - indices).astype(perfectly_upsampled_traces.dtype)
+        resampled_traces = (1 - weights) * perfectly_upsampled_traces[..., indices]
+        resampled_traces += weights * perfectly_upsampled_traces[..., indices + 1]
 
         # Digitisation
-        digital_trace = self._adc_types[adc_type](resampled_trace, adc_n_bits, adc_ref_voltage, adc_output)
+        digital_traces = self._adc_types[adc_type](resampled_traces, adc_n_bits, adc_ref_voltage, adc_output)
 
         # Ensuring trace has an even number of samples
-        if(len(digital_trace) % 2 == 1):
-            digital_trace = digital_trace[:-1]
+        if(digital_traces.shape[-1] % 2 == 1):
+            digital_traces = digital_traces[..., :-1]
 
-        if return_sampling_frequency:
-            return digital_trace, adc_sampling_frequency
-        else:
-            return digital_trace
+        return digital_traces
 
     @register_run()
     def run(self, evt, station, det,
             clock_offset=0.0,
+            random_clock_offset=False,
             adc_type='perfect_floor_comparator',
             adc_output='voltage',
-            trigger_filter=None):
+            trigger_filter=None,
+            n_threads=1):
         """
         Runs the analogToDigitalConverter and transforms the traces from all
         the channels of an input station to digital voltage values.
@@ -350,7 +712,11 @@ class analogToDigitalConverter:
         station: framework.station.Station object
         det: detector.detector.Detector object
         clock_offset: float
-
+            Offset of the ADC clock, in clock cycles
+        random_clock_offset: bool
+            If True, a random clock offset between 0 and 1 clock cycles is
+            drawn for every channel and replaces clock_offset. The random
+            generator can be seeded in begin.
         adc_type: string
             The type of ADC used. The following are available:
             - perfect_floor_comparator
@@ -358,23 +724,68 @@ class analogToDigitalConverter:
         adc_output: string
             - 'voltage' to store the ADC output as discretised voltage trace
             - 'counts' to store the ADC output in ADC counts
+            'packed' raises a ValueError. Use 'counts' and pack_counts to pack the counts for storage
         upsampling_factor: integer
             Upsampling factor. The digital trace will be a upsampled to a
             sampling frequency int_factor times higher than the original one
+        n_threads: int or None
+            Number of threads used to digitise the channels (default 1, no
+            threading). If None, the number of CPUs is used. The FFTs and the
+            numba comparator are already multithreaded, so more threads mainly
+            help for stations with many channels
 
         """
 
         t = time.time()
 
-        for channel in station.iter_channels():
-            digital_trace, adc_sampling_frequency = self.get_digital_trace(station, det, channel,
-                                                                           clock_offset=clock_offset,
-                                                                           adc_type=adc_type,
-                                                                           return_sampling_frequency=True,
-                                                                           adc_output=adc_output,
-                                                                           trigger_filter=trigger_filter)
+        # Channels that share the sampling rate, the number of samples and the
+        # ADC parameters are digitised together as a single 2D array
+        channels = list(station.iter_channels())
+        if random_clock_offset:
+            clock_offsets = self._random_generator.random(len(channels))
+        else:
+            clock_offsets = np.full(len(channels), clock_offset)
+
+        # The ADC parameters of every channel come from the cache of _resolve_adc_parameters
+        channel_groups = {}
+        for channel, channel_clock_offset in zip(channels, clock_offsets.tolist()):
+            adc_parameters = self._get_adc_parameters(station, det, channel, clock_offset=channel_clock_offset)
+            group_key = (channel.get_sampling_rate(), channel.get_number_of_samples()) + adc_parameters
+            channel_groups.setdefault(group_key, []).append(channel)
+
+        # The groups are split into chunks of channels that are digitised in
+        # parallel threads, since the filtering and resampling release the GIL.
+        # The traces are read and set in the main thread.
+        if(n_threads is None):
+            n_threads = os.cpu_count() or 1
+        chunks = []
+        for group_key, group_channels in channel_groups.items():
+            for chunk in np.array_split(np.arange(len(group_channels)), min(n_threads, len(group_channels))):
+                chunk_channels = [group_channels[i] for i in chunk]
+                traces = np.array([channel.get_trace() for channel in chunk_channels])
+                chunks.append((group_key, chunk_channels, traces))
+
+        def digitise_chunk(chunk):
+            group_key, chunk_channels, traces = chunk
+            MC_sampling_frequency = group_key[0]
+            adc_n_bits, adc_ref_voltage, adc_sampling_frequency, adc_time_delay = group_key[2:]
+            return self._get_digital_traces(traces, MC_sampling_frequency,
+                                            adc_n_bits, adc_ref_voltage,
+                                            adc_sampling_frequency, adc_time_delay,
+                                            adc_type=adc_type,
+                                            adc_output=adc_output,
+                                            trigger_filter=trigger_filter)
+
+        if(n_threads > 1 and len(chunks) > 1):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(n_threads, len(chunks))) as executor:
+                chunks_digital_traces = list(executor.map(digitise_chunk, chunks))
+        else:
+            chunks_digital_traces = [digitise_chunk(chunk) for chunk in chunks]
 
-            channel.set_trace(digital_trace, adc_sampling_frequency)
+        for (group_key, chunk_channels, traces), digital_traces in zip(chunks, chunks_digital_traces):
+            adc_sampling_frequency = group_key[4]
+            for channel, digital_trace in zip(chunk_channels, digital_traces):
+                channel.set_trace(digital_trace, adc_sampling_frequency)
 
         self.__t += time.time() - t
 
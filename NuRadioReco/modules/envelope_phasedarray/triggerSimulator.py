@@ -4,7 +4,6 @@ from NuRadioReco.framework.trigger import EnvelopePhasedTrigger
 from NuRadioReco.modules.phasedarray.triggerSimulator import triggerSimulator as phasedTrigger
 from NuRadioReco.modules.phasedarray.triggerSimulator import get_beam_rolls, get_channel_trace_start_time
 from NuRadioReco.utilities.diodeSimulator import diodeSimulator
-from NuRadioReco.modules.analogToDigitalConverter import analogToDigitalConverter
 import numpy as np
 from scipy import constants
 import logging
@@ -95,12 +94,11 @@ class triggerSimulator(phasedTrigger):
 
             if trigger_adc:
 
-                ADC = analogToDigitalConverter()
-                trace = ADC.get_digital_trace(station, det, channel,
-                                              trigger_adc=trigger_adc,
-                                              random_clock_offset=True,
-                                              adc_type='perfect_floor_comparator',
-                                              diode=diode)
+                # random clock offset from the generator seeded in the begin method of the ADC
+                trace = self._adc.get_digital_trace(station, det, channel,
+                                                    trigger_adc=trigger_adc,
+                                                    clock_offset=self._adc._random_generator.random(),
+                                                    adc_type='perfect_floor_comparator')
                 time_step = 1 / det.get_channel(station_id, channel_id)['trigger_adc_sampling_frequency']
                 times = np.arange(len(trace), dtype=np.float) * time_step
                 times += channel.get_trace_start_time()
@@ -30,6 +30,8 @@ class triggerSimulator:
         self.__t = 0
         self.__pre_trigger_time = None
         self.__debug = None
+        # the ADC caches its parameters and filters, so it is reused for every event
+        self._adc = analogToDigitalConverter()
         self.begin()
 
     def begin(self, debug=False, pre_trigger_time=100 * units.ns):
@@ -336,8 +338,6 @@ class triggerSimulator:
             error_msg = 'ADC output type must be "counts" or "voltage". Currently set to:' + str(adc_output)
             raise ValueError(error_msg)
 
-        ADC = analogToDigitalConverter()
-
         is_triggered = False
         trigger_delays = {}
 
@@ -347,16 +347,14 @@ class triggerSimulator:
         for channel in station.iter_channels(use_channels=triggered_channels):
             channel_id = channel.get_id()
 
-            trace = np.array(channel.get_trace())
-
-            trace, adc_sampling_frequency = ADC.get_digital_trace(station, det, channel,
-                                                                  Vrms=Vrms,
-                                                                  trigger_adc=trigger_adc,
-                                                                  clock_offset=clock_offset,
-                                                                  return_sampling_frequency=True,
-                                                                  adc_type='perfect_floor_comparator',
-                                                                  adc_output=adc_output,
-                                                                  trigger_filter=None)
+            trace, adc_sampling_frequency = self._adc.get_digital_trace(station, det, channel,
+                                                                        Vrms=Vrms,
+                                                                        trigger_adc=trigger_adc,
+                                                                        clock_offset=clock_offset,
+                                                                        return_sampling_frequency=True,
+                                                                        adc_type='perfect_floor_comparator',
+                                                                        adc_output=adc_output,
+                                                                        trigger_filter=None)
 
             # Upsampling here, linear interpolate to mimic an FPGA internal upsampling
             if not isinstance(upsampling_factor, int):
@@ -391,7 +389,7 @@ class triggerSimulator:
                 '''
 
                 #  If upsampled is performed, the final sampling frequency changes
-                trace = upsampled_trace[:]
+                trace = upsampled_trace
 
                 if(len(trace) % 2 == 1):
                     trace = trace[:-1]
@@ -400,7 +398,7 @@ class triggerSimulator:
 
             time_step = 1.0 / adc_sampling_frequency
 
-            traces[channel_id] = trace[:]
+            traces[channel_id] = trace
 
         beam_rolls = self.calculate_time_delays(station, det,
                                                 triggered_channels,
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+set -e
+python3 -m pytest NuRadioReco/test/ADC/test_analogToDigitalConverter.py
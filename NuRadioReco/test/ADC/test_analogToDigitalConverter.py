@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+import numpy as np
+import pytest
+import NuRadioReco.framework.event
+import NuRadioReco.framework.station
+import NuRadioReco.framework.channel
+import NuRadioReco.modules.analogToDigitalConverter
+from NuRadioReco.modules.analogToDigitalConverter import analogToDigitalConverter
+from NuRadioReco.utilities import units
+
+
+class DetectorStub:
+    """
+    Minimal detector that only returns the channel descriptions needed by the ADC
+    """
+
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_channel(self, station_id, channel_id):
+        return self.channels[channel_id]
+
+
+def get_adc_description(adc_n_bits=8, adc_sampling_frequency=0.5, adc_time_delay=0.):
+    return {'adc_nbits': adc_n_bits,
+            'adc_noise_nbits': 3,
+            'adc_reference_voltage': 1. * units.V,
+            'adc_sampling_frequency': adc_sampling_frequency,
+            'adc_time_delay': adc_time_delay}
+
+
+def create_event(n_channels=4, n_samples=2048, sampling_rate=3.2 * units.GHz, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(n_samples) / sampling_rate
+    event = NuRadioReco.framework.event.Event(1, 1)
+    station = NuRadioReco.framework.station.Station(1)
+    for channel_id in range(n_channels):
+        trace = 0.3 * np.sin(2 * np.pi * 0.2 * units.GHz * times + channel_id)
+        trace += 0.05 * rng.normal(size=n_samples)
+        trace += 0.8 * np.exp(-((times - 300 * units.ns) / (3 * units.ns)) ** 2)
+        channel = NuRadioReco.framework.channel.Channel(channel_id)
+        channel.set_trace(trace * units.V, sampling_rate)
+        station.add_channel(channel)
+    event.set_station(station)
+    return event, station
+
+
+def create_detector():
+    # the first two channels share their ADC parameters and are digitised together by run
+    return DetectorStub({0: get_adc_description(),
+                         1: get_adc_description(),
+                         2: get_adc_description(adc_time_delay=0.7 * units.ns),
+                         3: get_adc_description(adc_n_bits=4, adc_sampling_frequency=1.2)})
+
+
+def test_run_matches_get_digital_trace():
+    det = create_detector()
+    event, station = create_event()
+    adc = analogToDigitalConverter()
+    expected = {}
+    for channel in station.iter_channels():
+        expected[channel.get_id()] = adc.get_digital_trace(station, det, channel, clock_offset=0.3,
+                                                           return_sampling_frequency=True)
+
+    adc.run(event, station, det, clock_offset=0.3)
+    for channel in station.iter_channels():
+        trace, sampling_frequency = expected[channel.get_id()]
+        assert channel.get_sampling_rate() == sampling_frequency
+        np.testing.assert_array_equal(channel.get_trace(), trace)
+
+
+def test_second_event_hits_cache():
+    # the trigger simulators keep one ADC and call get_digital_trace for every event
+    det = create_detector()
+    adc = analogToDigitalConverter()
+    for seed in range(2):
+        event, station = create_event(seed=seed)
+        for channel in station.iter_channels():
+            adc.get_digital_trace(station, det, channel, clock_offset=0.3)
+        if(seed == 0):
+            cached_parameters = {key: value[1] for key, value in adc._adc_parameters_cache.items()}
+            upsampling_filters = dict(adc._upsampling_filters)
+
+    assert len(upsampling_filters) > 0
+    assert len(adc._upsampling_filters) == len(upsampling_filters)
+    for key, fir_coefficients in upsampling_filters.items():
+        assert adc._upsampling_filters[key] is fir_coefficients
+    for key, adc_parameters in cached_parameters.items():
+        assert adc._adc_parameters_cache[key][1] is adc_parameters
+
+
+@pytest.mark.skipif(not NuRadioReco.modules.analogToDigitalConverter.numba_available, reason="numba is not installed")
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("mode", ['floor', 'ceiling'])
+def test_comparator_numba_matches_numpy(monkeypatch, dtype, mode):
+    trace = (0.4 * np.random.default_rng(1).normal(size=1000000)).astype(dtype)
+    comparator = NuRadioReco.modules.analogToDigitalConverter.perfect_comparator
+    numba_counts = comparator(trace, 8, 0.37 * units.V, mode=mode, output='counts')
+    monkeypatch.setattr(NuRadioReco.modules.analogToDigitalConverter, 'numba_available', False)
+    numpy_counts = comparator(trace, 8, 0.37 * units.V, mode=mode, output='counts')
+    assert numba_counts.dtype == numpy_counts.dtype
+    np.testing.assert_array_equal(numba_counts, numpy_counts)
+
+
+@pytest.mark.skipif(not NuRadioReco.modules.analogToDigitalConverter.numba_available, reason="numba is not installed")
+def test_comparator_numba_matches_numpy_infinite(monkeypatch):
+    # infinite voltages saturate the ADC. The cast of NaN to an integer is undefined, so NaN is not tested
+    trace = np.array([np.inf, -np.inf, 0.2, -0.2])
+    comparator = NuRadioReco.modules.analogToDigitalConverter.perfect_comparator
+    numba_counts = comparator(trace, 8, 1. * units.V, output='counts')
+    monkeypatch.setattr(NuRadioReco.modules.analogToDigitalConverter, 'numba_available', False)
+    numpy_counts = comparator(trace, 8, 1. * units.V, output='counts')
+    np.testing.assert_array_equal(numba_counts, [127, -128, 25, -26])
+    np.testing.assert_array_equal(numpy_counts, numba_counts)
+
+
+def test_random_clock_offset_seed():
+    det = create_detector()
+    traces = []
+    for seed in [42, 42, 43]:
+        event, station = create_event()
+        adc = analogToDigitalConverter()
+        adc.begin(seed=seed)
+        adc.run(event, station, det, random_clock_offset=True)
+        traces.append([channel.get_trace() for channel in station.iter_channels()])
+    for trace, same_seed_trace in zip(traces[0], traces[1]):
+        np.testing.assert_array_equal(trace, same_seed_trace)
+    assert not all(np.array_equal(trace, other_seed_trace) for trace, other_seed_trace in zip(traces[0], traces[2]))
+
+
+@pytest.mark.parametrize("adc_n_bits", range(1, 33))
+def test_pack_counts_round_trip(adc_n_bits):
+    n_samples = 101
+    lowest_count = -2 ** (adc_n_bits - 1)
+    highest_count = 2 ** (adc_n_bits - 1) - 1
+    rng = np.random.default_rng(adc_n_bits)
+    counts = rng.integers(lowest_count, highest_count, size=(3, n_samples), endpoint=True)
+    counts[:, :2] = [lowest_count, highest_count]
+    counts = counts.astype(NuRadioReco.modules.analogToDigitalConverter.adc_counts_dtype(adc_n_bits))
+
+    packed = NuRadioReco.modules.analogToDigitalConverter.pack_counts(counts, adc_n_bits)
+    assert packed.dtype == np.uint8
+    assert packed.shape == (3, int(np.ceil(n_samples * adc_n_bits / 8)))
+
+    unpacked = NuRadioReco.modules.analogToDigitalConverter.unpack_counts(packed, adc_n_bits, n_samples)
+    assert unpacked.dtype == counts.dtype
+    np.testing.assert_array_equal(unpacked, counts)
+
+
+def test_pack_counts_layout():
+    # offset binary, most significant bit first: -8, 7, 0, -1 -> 0x0, 0xf, 0x8, 0x7
+    packed = NuRadioReco.modules.analogToDigitalConverter.pack_counts(np.array([-8, 7, 0, -1]), 4)
+    np.testing.assert_array_equal(packed, [0x0f, 0x87])
+    # the last byte is padded with zeros
+    packed = NuRadioReco.modules.analogToDigitalConverter.pack_counts(np.array([1, -1, 0]), 3)
+    np.testing.assert_array_equal(packed, [0b10101110, 0b00000000])
+
+
+@pytest.mark.parametrize("count", [-9, 8])
+def test_pack_counts_out_of_range(count):
+    with pytest.raises(ValueError):
+        NuRadioReco.modules.analogToDigitalConverter.pack_counts(np.array([0, count]), 4)
+
+
+def test_comparator_packed_output():
+    trace = 0.4 * np.random.default_rng(2).normal(size=50)
+    comparator = NuRadioReco.modules.analogToDigitalConverter.perfect_comparator
+    packed = comparator(trace, 4, 1. * units.V, output='packed')
+    counts = comparator(trace, 4, 1. * units.V, output='counts')
+    assert packed.shape == (25,)
+    np.testing.assert_array_equal(NuRadioReco.modules.analogToDigitalConverter.unpack_counts(packed, 4, 50), counts)
+
+
+def test_run_rejects_packed_output():
+    event, station = create_event()
+    with pytest.raises(ValueError):
+        analogToDigitalConverter().run(event, station, create_detector(), adc_output='packed')
+
+
+def test_run_without_channels():
+    event, station = create_event(n_channels=0)
+    analogToDigitalConverter().run(event, station, create_detector())
+
+
+def test_run_threads_match_serial():
+    det = create_detector()
+    event, station = create_event(n_channels=4)
+    threaded_event, threaded_station = create_event(n_channels=4)
+    analogToDigitalConverter().run(event, station, det, clock_offset=0.3)
+    analogToDigitalConverter().run(threaded_event, threaded_station, det, clock_offset=0.3, n_threads=4)
+    for channel, threaded_channel in zip(station.iter_channels(), threaded_station.iter_channels()):
+        np.testing.assert_array_equal(channel.get_trace(), threaded_channel.get_trace())
+
+
+def band_limited_signal(times):
+    signal = 0.3 * np.sin(2 * np.pi * 110 * units.MHz * times + 0.4)
+    signal += 0.25 * np.sin(2 * np.pi * 43 * units.MHz * times + 1.1)
+    signal += 0.2 * np.sin(2 * np.pi * 70 * units.MHz * times + 2.)
+    return signal * units.V
+
+
+@pytest.mark.parametrize("sampling_rate, adc_sampling_frequency", [(3.2 * units.GHz, 1. * units.GHz),
+                                                                    (2. * units.GHz, 0.5 * units.GHz),
+                                                                    (5. * units.GHz, 1. * units.GHz),
+                                                                    (10. * units.GHz, 0.5 * units.GHz)])
+@pytest.mark.parametrize("adc_time_delay", [0., 0.13 * units.ns, 1.71 * units.ns])
+@pytest.mark.parametrize("clock_offset", [0., 0.3, 0.77])
+def test_digital_trace_accuracy(sampling_rate, adc_sampling_frequency, adc_time_delay, clock_offset):
+    adc_n_bits = 12
+    n_samples = 2048
+    det = DetectorStub({0: get_adc_description(adc_n_bits=adc_n_bits, adc_sampling_frequency=adc_sampling_frequency,
+                                               adc_time_delay=adc_time_delay)})
+    station = NuRadioReco.framework.station.Station(1)
+    channel = NuRadioReco.framework.channel.Channel(0)
+    channel.set_trace(band_limited_signal(np.arange(n_samples) / sampling_rate), sampling_rate)
+    station.add_channel(channel)
+
+    counts = analogToDigitalConverter().get_digital_trace(station, det, channel, clock_offset=clock_offset,
+                                                          adc_output='counts')
+
+    # The samples delayed beyond the start of the trace are discarded, and the
+    # first ADC sample lies one clock cycle before the start of the delayed trace
+    delay_in_samples = (adc_time_delay + clock_offset / adc_sampling_frequency) * sampling_rate
+    fractional_delay = delay_in_samples - np.floor(delay_in_samples)
+    sampling_times = (np.arange(len(counts)) - 1) / adc_sampling_frequency + (1 - fractional_delay) / sampling_rate
+    lsb_voltage = 1. * units.V / (2 ** (adc_n_bits - 1) - 1)
+    expected_counts = np.floor(band_limited_signal(sampling_times) / lsb_voltage)
+
+    # the delay is rounded to 1/64 of an input sample, which causes errors of a few counts
+    edge = 20
+    np.testing.assert_allclose(counts[edge:-edge], expected_counts[edge:-edge], rtol=0, atol=3)
+
+
+def test_digital_trace_sampling_does_not_drift():
+    # At an integer rate ratio without delay, the ADC samples every fourth
+    # input sample of the delayed trace, which starts at the second sample.
+    # This holds until the end of the trace, also for white noise.
+    adc_n_bits = 12
+    n_samples = 2048
+    sampling_rate = 2. * units.GHz
+    det = DetectorStub({0: get_adc_description(adc_n_bits=adc_n_bits, adc_sampling_frequency=0.5)})
+    station = NuRadioReco.framework.station.Station(1)
+    channel = NuRadioReco.framework.channel.Channel(0)
+    trace = 0.3 * np.random.default_rng(3).normal(size=n_samples) * units.V
+    channel.set_trace(trace, sampling_rate)
+    station.add_channel(channel)
+
+    counts = analogToDigitalConverter().get_digital_trace(station, det, channel, adc_output='counts')
+
+    lsb_voltage = 1. * units.V / (2 ** (adc_n_bits - 1) - 1)
+    expected_counts = np.floor(trace[1 + 4 * (np.arange(len(counts)) - 1)] / lsb_voltage)
+    edge = 20
+    np.testing.assert_allclose(counts[edge:-edge], expected_counts[edge:-edge], rtol=0, atol=1)
+
+
+def test_round_to_int():
+    round_to_int = NuRadioReco.modules.analogToDigitalConverter.round_to_int
+    trace = np.array([1.4, -2.6, 2.5])
+    assert round_to_int(trace).dtype == np.array([1]).dtype
+    np.testing.assert_array_equal(round_to_int(trace), [1, -3, 2])
+    assert round_to_int(trace, adc_n_bits=8).dtype == np.int8
+    assert round_to_int(np.array([3, 4], dtype=np.int64), adc_n_bits=12).dtype == np.int16
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import numpy as np
+import pytest
+import scipy.signal
+from NuRadioReco.utilities import analytic_pulse
+from NuRadioReco.utilities import trace_utilities
+from NuRadioReco.utilities import units
+
+
+def get_analytic_pulse_freq_direct(amp_p0, amp_p1, phase_p0, n_samples_time, sampling_rate,
+                                   phase_p1=0, bandpass=None, quadratic_term=0, quadratic_term_offset=0):
+    """
+    Direct evaluation of the analytic pulse spectrum on all frequencies, with the
+    Butterworth bandpass filter computed from its transfer function coefficients
+    """
+    amp_p0 /= trace_utilities.conversion_factor_integrated_signal
+    dt = 1. / sampling_rate
+    frequencies = np.fft.rfftfreq(n_samples_time, dt)
+    df = frequencies[1] - frequencies[0]
+    A = np.sign(amp_p0) * (np.abs(amp_p0)) ** 0.5
+    amps = A * 10 ** (frequencies * amp_p1 + quadratic_term * (frequencies - quadratic_term_offset) ** 2)
+    if(bandpass is None):
+        norm = -1. / (2 * amp_p1 * np.log(10))
+    else:
+        norm = (100 ** (amp_p1 * bandpass[1]) - 100 ** (amp_p1 * bandpass[0])) / (2 * amp_p1 * np.log(10))
+    phases = phase_p0 + frequencies * phase_p1
+    xx = amps * np.exp(phases * 1j) / norm ** 0.5 / dt ** 0.5 * df ** 0.5
+    if(bandpass is not None):
+        b, a = scipy.signal.butter(10, bandpass, 'bandpass', analog=True)
+        w, h = scipy.signal.freqs(b, a, frequencies)
+        xx *= h
+    return xx
+
+
+pulse_parameters = [(1., -2., 0.3, 256, 5. * units.GHz),
+                    (4., -1., 1.3, 2001, 2. * units.GHz),
+                    (-2., -3., 0., 512, 3.2 * units.GHz)]
+bandpasses = [None, (80 * units.MHz, 500 * units.MHz)]
+
+
+@pytest.mark.parametrize("parameters", pulse_parameters)
+@pytest.mark.parametrize("bandpass", bandpasses)
+@pytest.mark.parametrize("phase_p1", [0, -1.])
+@pytest.mark.parametrize("quadratic_term", [0, 0.5])
+def test_analytic_pulse_freq(parameters, bandpass, phase_p1, quadratic_term):
+    kwargs = dict(phase_p1=phase_p1, bandpass=bandpass, quadratic_term=quadratic_term,
+                  quadratic_term_offset=0.1 * units.GHz)
+    expected = get_analytic_pulse_freq_direct(*parameters, **kwargs)
+    spectrum = analytic_pulse.get_analytic_pulse_freq(*parameters, **kwargs)
+    # outside of the passband, the spectrum is set to zero where the filter suppresses it by more than 1e-6
+    atol = 1e-6 * np.max(np.abs(expected))
+    assert spectrum.dtype == np.complex128
+    np.testing.assert_allclose(spectrum, expected, rtol=1e-5, atol=atol)
+
+    # the cached frequencies and filter responses are not modified by a call
+    np.testing.assert_array_equal(analytic_pulse.get_analytic_pulse_freq(*parameters, **kwargs), spectrum)
+
+
+@pytest.mark.parametrize("parameters", pulse_parameters)
+@pytest.mark.parametrize("bandpass", bandpasses)
+@pytest.mark.parametrize("phase_p1", [0, -1.])
+@pytest.mark.parametrize("quadratic_term", [0, 0.5])
+def test_analytic_pulse_single_precision(parameters, bandpass, phase_p1, quadratic_term):
+    kwargs = dict(phase_p1=phase_p1, bandpass=bandpass, quadratic_term=quadratic_term,
+                  quadratic_term_offset=0.1 * units.GHz)
+    expected = get_analytic_pulse_freq_direct(*parameters, **kwargs)
+    spectrum = analytic_pulse.get_analytic_pulse_freq(*parameters, dtype=np.complex64, **kwargs)
+    assert spectrum.dtype == np.complex64
+    np.testing.assert_allclose(spectrum, expected, rtol=0, atol=1e-5 * np.max(np.abs(expected)))
+
+    expected_trace = analytic_pulse.get_analytic_pulse(*parameters, **kwargs)
+    trace = analytic_pulse.get_analytic_pulse(*parameters, dtype=np.complex64, **kwargs)
+    assert trace.dtype == np.float32
+    np.testing.assert_allclose(trace, expected_trace, rtol=0, atol=1e-5 * np.max(np.abs(expected_trace)))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import numpy as np
+import pytest
+from NuRadioReco.utilities import analytic_pulse
+from NuRadioReco.utilities import fft
+from NuRadioReco.utilities import units
+
+
+@pytest.mark.parametrize("n_samples", [256, 1001])
+def test_double_precision_matches_numpy(n_samples):
+    sampling_rate = 3.2 * units.GHz
+    traces = np.random.default_rng(n_samples).normal(size=(3, n_samples))
+    expected_spectra = np.fft.rfft(traces, axis=-1) / sampling_rate * 2 ** 0.5
+    spectra = fft.time2freq(traces, sampling_rate)
+    assert spectra.dtype == np.complex128
+    # numpy < 2 uses another pocketfft build than scipy.fft, so the results only agree to rounding errors
+    np.testing.assert_allclose(spectra, expected_spectra, rtol=1e-12, atol=1e-12 * np.max(np.abs(expected_spectra)))
+
+    expected_traces = np.fft.irfft(expected_spectra, axis=-1, n=n_samples) * sampling_rate / 2 ** 0.5
+    np.testing.assert_allclose(fft.freq2time(spectra, sampling_rate, n=n_samples), expected_traces,
+                               rtol=1e-12, atol=1e-12 * np.max(np.abs(expected_traces)))
+
+
+@pytest.mark.parametrize("sampling_rate", [1, 3.2 * units.GHz, np.float64(3.2 * units.GHz)])
+def test_single_precision_round_trip(sampling_rate):
+    trace = np.random.default_rng(0).normal(size=1001).astype(np.float32)
+    spectrum = fft.time2freq(trace, sampling_rate)
+    assert spectrum.dtype == np.complex64
+    round_trip_trace = fft.freq2time(spectrum, sampling_rate, n=len(trace))
+    assert round_trip_trace.dtype == np.float32
+    np.testing.assert_allclose(round_trip_trace, trace, rtol=0, atol=1e-5 * np.max(np.abs(trace)))
+
+
+@pytest.mark.parametrize("n_samples_time", [255, 256, 2001])
+def test_analytic_pulse_length(n_samples_time):
+    trace = analytic_pulse.get_analytic_pulse(1., -2., 0.3, n_samples_time, 2. * units.GHz)
+    assert len(trace) == n_samples_time
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+import numpy as np
+import pytest
+import scipy.signal
+from NuRadioReco.utilities import trace_utilities
+from NuRadioReco.utilities import units
+
+
+def upsampling_fir_loop(trace, original_sampling_frequency, int_factor=2, ntaps=2**7):
+    """
+    Reference implementation of upsampling_fir with an explicit loop and a direct convolution
+    """
+    zeroed_trace = np.zeros(len(trace) * int_factor)
+    for i_point, point in enumerate(trace[:-1]):
+        zeroed_trace[i_point * int_factor] = point
+
+    upsampled_delta_time = 1 / (int_factor * original_sampling_frequency)
+    upsampled_times = np.arange(0, len(zeroed_trace) * upsampled_delta_time, upsampled_delta_time)
+
+    cutoff = 1. / int_factor
+    fir_coeffs = scipy.signal.firwin(ntaps, cutoff, window='boxcar')
+    return np.convolve(zeroed_trace, fir_coeffs)[:len(upsampled_times)] * int_factor
+
+
+@pytest.mark.parametrize("int_factor", [2, 3, 4])
+@pytest.mark.parametrize("ntaps", [2**5, 2**7, 101])
+def test_upsampling_fir(int_factor, ntaps):
+    sampling_frequency = 1. * units.GHz
+    trace = np.random.default_rng(int_factor * ntaps).normal(size=500)
+    expected = upsampling_fir_loop(trace, sampling_frequency, int_factor, ntaps)
+    upsampled_trace = trace_utilities.upsampling_fir(trace, sampling_frequency, int_factor, ntaps)
+    assert upsampled_trace.shape == expected.shape
+    np.testing.assert_allclose(upsampled_trace, expected, rtol=0, atol=1e-10 * np.max(np.abs(expected)))
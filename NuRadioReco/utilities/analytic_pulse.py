@@ -1,5 +1,6 @@
 import numpy as np
 import scipy.signal
+from functools import lru_cache
 from NuRadioReco.utilities import fft
 from NuRadioReco.utilities import trace_utilities
 
@@ -17,8 +18,38 @@ def amp_from_energy(energy):
     return 0.5 * np.log10(energy) + 0.12876705
 
 
+@lru_cache(maxsize=128)
+def _get_frequencies(n_samples_time, sampling_rate):
+    """
+    Returns the (read-only) frequencies of a real FFT and their spacing. Cached because fitters call
+    the analytic pulse many times with the same trace length and sampling rate.
+    """
+    frequencies = np.fft.rfftfreq(n_samples_time, 1. / sampling_rate)
+    frequencies.flags.writeable = False
+    return frequencies, frequencies[1] - frequencies[0]
+
+
+@lru_cache(maxsize=128)
+def _get_bandpass_response(bandpass, n_samples_time, sampling_rate):
+    """
+    Returns the response of the 10th order analog Butterworth bandpass filter in the bins where it is
+    not negligible, and the mask of these bins. The filter suppresses the other bins to negligible
+    amplitudes, so the spectrum only needs to be evaluated in the passband.
+    The response is computed from the zeros and poles of the filter, which is numerically stable.
+    """
+    frequencies, df = _get_frequencies(n_samples_time, sampling_rate)
+    z, p, k = trace_utilities.get_butterworth_zpk(10, bandpass)
+    w, h = scipy.signal.freqs_zpk(z, p, k, frequencies)
+    in_band = np.abs(h) > 1e-6
+    h = h[in_band]
+    h.flags.writeable = False
+    in_band.flags.writeable = False
+    return h, in_band
+
+
 def get_analytic_pulse_freq(amp_p0, amp_p1, phase_p0, n_samples_time, sampling_rate,
-                            phase_p1=0, bandpass=None, quadratic_term=0, quadratic_term_offset=0):
+                            phase_p1=0, bandpass=None, quadratic_term=0, quadratic_term_offset=0,
+                            dtype=np.complex128):
     """
     Analytic pulse as described in PhD thesis Glaser and NuRadioReco paper in the frequency domain
 
@@ -46,13 +77,27 @@ def get_analytic_pulse_freq(amp_p0, amp_p1, phase_p0, n_samples_time, sampling_r
     quadratic_term_offset:
         default 0
 
+    dtype:
+        complex type of the spectrum, default np.complex128. np.complex64 halves the memory and
+        speeds up the computation and the FFT if single precision is sufficient
+
     """
     amp_p0 /= trace_utilities.conversion_factor_integrated_signal  # input variable is energy in eV/m^2
     dt = 1. / sampling_rate
-    frequencies = np.fft.rfftfreq(n_samples_time, dt)
-    df = frequencies[1] - frequencies[0]
+    frequencies, df = _get_frequencies(n_samples_time, sampling_rate)
+    frequencies = frequencies.astype(np.finfo(dtype).dtype, copy=False)
+    if(bandpass is not None):
+        h, in_band = _get_bandpass_response(tuple(bandpass), n_samples_time, sampling_rate)
+        n_frequencies = len(frequencies)
+        frequencies = frequencies[in_band]
     A = np.sign(amp_p0) * (np.abs(amp_p0)) ** 0.5
-    amps = A * 10 ** (frequencies * amp_p1 + quadratic_term * (frequencies - quadratic_term_offset)**2)
+    # scalars are converted to Python numbers so that they keep the precision of the frequencies
+    # 10 ** x is evaluated as exp(ln(10) * x), which is faster than a power for every bin
+    if(quadratic_term == 0):
+        amps = np.exp(float(amp_p1 * np.log(10)) * frequencies)
+    else:
+        exponent = frequencies * float(amp_p1) + float(quadratic_term) * (frequencies - float(quadratic_term_offset))**2
+        amps = np.exp(float(np.log(10)) * exponent)
     if(bandpass is None):
         norm = -1. / (2 * amp_p1 * np.log(10))
     else:
@@ -61,20 +106,26 @@ def get_analytic_pulse_freq(amp_p0, amp_p1, phase_p0, n_samples_time, sampling_r
         else:
             norm = (100 ** (amp_p1 * bandpass[1]) - 100 ** (amp_p1 * bandpass[0])) / (2 * amp_p1 * np.log(10))
 
-    phases = phase_p0 + frequencies * phase_p1
-    xx = amps * np.exp(phases * 1j) / norm ** 0.5 / dt ** 0.5 * df ** 0.5
+    scale = complex(A * np.exp(1j * phase_p0) / norm ** 0.5 / dt ** 0.5 * df ** 0.5)
+    if(phase_p1 == 0):
+        xx = amps * scale
+    else:
+        phases = frequencies * float(phase_p1)
+        xx = amps * (np.cos(phases) + 1j * np.sin(phases)) * scale
 
     if(bandpass is not None):
-        b, a = scipy.signal.butter(10, bandpass, 'bandpass', analog=True)
-        w, h = scipy.signal.freqs(b, a, frequencies)
         xx *= h
+        spectrum = np.zeros(n_frequencies, dtype=xx.dtype)
+        spectrum[in_band] = xx
+        xx = spectrum
     return xx
 
 
 def get_analytic_pulse(amp_p0, amp_p1, phase_p0, n_samples_time,
                        sampling_rate,
                        phase_p1=0, bandpass=None,
-                       quadratic_term=0, quadratic_term_offset=0):
+                       quadratic_term=0, quadratic_term_offset=0,
+                       dtype=np.complex128):
     """
     Analytic pulse as described in PhD thesis Glaser and NuRadioReco paper in the time domain
 
@@ -102,10 +153,14 @@ def get_analytic_pulse(amp_p0, amp_p1, phase_p0, n_samples_time,
     quadratic_term_offset:
         default 0
 
+    dtype:
+        complex type of the spectrum before the FFT, default np.complex128
+
     """
     xx = get_analytic_pulse_freq(amp_p0, amp_p1, phase_p0, n_samples_time,
                                  sampling_rate, phase_p1=phase_p1,
                                  bandpass=bandpass,
                                  quadratic_term=quadratic_term,
-                                 quadratic_term_offset=quadratic_term_offset)
-    return fft.freq2time(xx, sampling_rate)
+                                 quadratic_term_offset=quadratic_term_offset,
+                                 dtype=dtype)
+    return fft.freq2time(xx, sampling_rate, n=n_samples_time)
@@ -1,7 +1,8 @@
 import numpy as np
+import scipy.fft
 
 """
-A wrapper around the numpy fft routines to achive a coherent normalization of the fft
+A wrapper around the scipy fft routines to achive a coherent normalization of the fft
 As we have real valued data in the time domain, we use the 'real ffts' that omit the negative frequencies in Fourier
 space. To account for the missing power in the frequency domain, we multiply the frequency spectrum by sqrt(2),
 and divide the iFFT with 1/sqrt(2) accordingly. The frequency spectrum is divided by the sampling rate so that the
@@ -10,6 +11,11 @@ sampling rate.
 Then, a calculation of the power leads the same result in
 the time and frequency domain, i.e.
 np.sum(trace**2) * dt = np.sum(spectrum**2/dt**2) * df
+The transforms are computed with scipy.fft, which parallelises stacked traces over all cores.
+Single precision input (float32 traces or complex64 spectra) is transformed in single precision,
+double precision input in double precision.
+The traces are not zero padded to a fast FFT length (scipy.fft.next_fast_len), because
+the inverse FFT of a padded spectrum is not the same trace.
 """
 
 
@@ -24,7 +30,11 @@ def time2freq(trace, sampling_rate):
     sampling_rate: float
         sampling rate of the trace
     """
-    return np.fft.rfft(trace, axis=-1) / sampling_rate * 2 ** 0.5  # an additional sqrt(2) is added because negative frequencies are omitted.
+    spectrum = scipy.fft.rfft(trace, axis=-1, workers=-1)
+    # the normalisation factors have the precision of the spectrum, so that it is not promoted.
+    # an additional sqrt(2) is added because negative frequencies are omitted.
+    real_type = np.finfo(spectrum.dtype).dtype.type
+    return spectrum / real_type(sampling_rate) * real_type(2 ** 0.5)
 
 
 def freq2time(spectrum, sampling_rate, n=None):
@@ -40,4 +50,6 @@ def freq2time(spectrum, sampling_rate, n=None):
     n: int
         the number of sample in the time domain (relevant if time trace has an odd number of samples)
     """
-    return np.fft.irfft(spectrum, axis=-1, n=n) * sampling_rate / 2 ** 0.5
+    trace = scipy.fft.irfft(spectrum, axis=-1, n=n, workers=-1)
+    real_type = trace.dtype.type
+    return trace * real_type(sampling_rate) / real_type(2 ** 0.5)
@@ -1,11 +1,13 @@
 import numpy as np
 import scipy.constants
 import scipy.signal
+import scipy.fft
 from NuRadioReco.utilities import units
 from NuRadioReco.utilities import ice
 from NuRadioReco.utilities import geometryUtilities as geo_utl
 from NuRadioReco.utilities import fft
 import logging
+from functools import lru_cache
 logger = logging.getLogger('NuRadioReco.trace_utilities')
 
 conversion_factor_integrated_signal = scipy.constants.c * scipy.constants.epsilon_0 * units.joule / units.s / units.volt ** 2
@@ -146,17 +148,39 @@ def upsampling_fir(trace, original_sampling_frequency, int_factor=2, ntaps=2**7)
         raise ValueError(error_msg)
 
     zeroed_trace = np.zeros(len(trace) * int_factor)
-    for i_point, point in enumerate(trace[:-1]):
-        zeroed_trace[i_point * int_factor] = point
+    zeroed_trace[:(len(trace) - 1) * int_factor:int_factor] = trace[:-1]
 
-    upsampled_delta_time = 1 / (int_factor * original_sampling_frequency)
-    upsampled_times = np.arange(0, len(zeroed_trace) * upsampled_delta_time, upsampled_delta_time)
+    fir_coeffs = get_upsampling_fir_coefficients(int_factor, ntaps)
+    upsampled_trace = scipy.signal.oaconvolve(zeroed_trace, fir_coeffs)[:len(zeroed_trace)] * int_factor
+
+    return upsampled_trace
+
+
+@lru_cache(maxsize=32)
+def get_upsampling_fir_coefficients(int_factor, ntaps):
+    """
+    Returns the coefficients of the boxcar low-pass FIR filter used by
+    upsampling_fir. The design is cached, so it is only done once for every
+    upsampling factor and number of taps.
+
+    Parameters
+    ----------
+    int_factor: integer
+        Upsampling factor
+    ntaps: integer
+        Number of taps (order) of the FIR filter
+
+    Returns
+    -------
+    fir_coeffs: array of floats
+        The (read-only) filter coefficients
+    """
 
     cutoff = 1. / int_factor
     fir_coeffs = scipy.signal.firwin(ntaps, cutoff, window='boxcar')
-    upsampled_trace = np.convolve(zeroed_trace, fir_coeffs)[:len(upsampled_times)] * int_factor
+    fir_coeffs.flags.writeable = False
 
-    return upsampled_trace
+    return fir_coeffs
 
 
 def butterworth_filter_trace(trace, sampling_frequency, passband, order=8):
@@ -166,7 +190,8 @@ def butterworth_filter_trace(trace, sampling_frequency, passband, order=8):
     Parameters
     ----------
     trace: array of floats
-        Trace to be filtered
+        Trace to be filtered. Several traces can be filtered at once by
+        stacking them along the first axis
     sampling_frequency: float
         Sampling frequency
     passband: (float, float) tuple
@@ -180,7 +205,7 @@ def butterworth_filter_trace(trace, sampling_frequency, passband, order=8):
         The filtered trace
     """
 
-    n_samples = len(trace)
+    n_samples = trace.shape[-1]
 
     spectrum = fft.time2freq(trace, sampling_frequency)
     frequencies = np.fft.rfftfreq(n_samples, 1 / sampling_frequency)
@@ -191,6 +216,30 @@ def butterworth_filter_trace(trace, sampling_frequency, passband, order=8):
     return filtered_trace
 
 
+@lru_cache(maxsize=32)
+def get_butterworth_zpk(order, passband):
+    """
+    Designs an analog bandpass Butterworth filter in zeros, poles and gain
+    form. Evaluating the response from the zeros and poles is numerically
+    stable also at high orders, contrary to the polynomial (b, a) form.
+    The design is cached, so it is only done once for every filter.
+
+    Parameters
+    ----------
+    order: integer
+        Filter order
+    passband: (float, float) tuple
+        Tuple indicating the cutoff frequencies
+
+    Returns
+    -------
+    z, p, k: arrays of complex and float
+        Zeros, poles and gain of the filter
+    """
+
+    return scipy.signal.butter(order, passband, 'bandpass', analog=True, output='zpk')
+
+
 def apply_butterworth(spectrum, frequencies, passband, order=8):
     """
     Calculates the response from a Butterworth filter and applies it to the
@@ -213,10 +262,10 @@ def apply_butterworth(spectrum, frequencies, passband, order=8):
         The filtered spectrum
     """
 
-    f = np.zeros_like(frequencies, dtype=np.complex)
+    f = np.zeros_like(frequencies, dtype=complex)
     mask = frequencies > 0
-    b, a = scipy.signal.butter(order, passband, 'bandpass', analog=True)
-    w, h = scipy.signal.freqs(b, a, frequencies[mask])
+    z, p, k = get_butterworth_zpk(order, tuple(passband))
+    w, h = scipy.signal.freqs_zpk(z, p, k, frequencies[mask])
     f[mask] = h
 
     filtered_spectrum = f * spectrum
@@ -235,7 +284,8 @@ def delay_trace(trace, sampling_frequency, time_delay, delayed_samples):
     Parameters
     ----------
     trace: array of floats
-        Array containing the trace
+        Array containing the trace. Several traces can be delayed at once by
+        stacking them along the first axis
     sampling_frequency: float
         Sampling rate for the trace
     time_delay: float
@@ -253,18 +303,19 @@ def delay_trace(trace, sampling_frequency, time_delay, delayed_samples):
         msg = 'Time delay must be positive'
         raise ValueError(msg)
 
-    n_samples = len(trace)
+    n_samples = trace.shape[-1]
 
-    spectrum = fft.time2freq(trace, sampling_frequency)
+    # the normalisation of the FFT cancels out, so the multithreaded scipy.fft is used directly
+    spectrum = scipy.fft.rfft(trace, axis=-1, workers=-1)
     frequencies = np.fft.rfftfreq(n_samples, 1 / sampling_frequency)
 
     spectrum *= np.exp(-1j * 2 * np.pi * frequencies * time_delay)
 
-    delayed_trace = fft.freq2time(spectrum, sampling_frequency)
+    delayed_trace = scipy.fft.irfft(spectrum, axis=-1, workers=-1)
 
     init_sample = int(time_delay * sampling_frequency) + 1
 
-    delayed_trace = delayed_trace[init_sample:None]
-    delayed_trace = delayed_trace[:delayed_samples]
+    delayed_trace = delayed_trace[..., init_sample:None]
+    delayed_trace = delayed_trace[..., :delayed_samples]
 
     return delayed_trace
@@ -11,4 +11,6 @@ NuRadioMC/test/atmospheric_Aeff/1e18eV/test_build.sh
 NuRadioMC/test/examples/test_examples.sh
 NuRadioReco/test/tiny_reconstruction/testTinyReconstruction.sh
 NuRadioReco/test/trigger_tests/run_trigger_test.sh
+NuRadioReco/test/ADC/run_adc_test.sh
+NuRadioReco/test/utilities/run_utilities_test.sh
 NuRadioReco/test/test_examples.sh
\ No newline at end of file